@@ -3,7 +3,7 @@ import subprocess
 import sys
 import os
 import time
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Tuple, Union
 
 class NetworkConfigManager:
     def __init__(self):
@@ -31,6 +31,29 @@ class NetworkConfigManager:
             'Terraria Server': 7777
         }
 
+        # Default per-source rate limit (new connections per second / burst) and
+        # concurrent connection cap used when limiting a service
+        self.default_limits = {'rate': 10, 'burst': 20, 'connlimit': 50}
+
+        # Per-service overrides of the default limits
+        self.service_limits = {
+            'SSH': {'rate': 1, 'burst': 5, 'connlimit': 5},
+            'FTP': {'rate': 2, 'burst': 10, 'connlimit': 10},
+            'HTTP': {'rate': 50, 'burst': 100, 'connlimit': 100},
+            'HTTPS': {'rate': 50, 'burst': 100, 'connlimit': 100}
+        }
+
+        # UFW rules files holding the custom limit block, per address family
+        self.limit_rules_files = {
+            'ipv4': '/etc/ufw/before.rules',
+            'ipv6': '/etc/ufw/before6.rules'
+        }
+        self.limit_block_start = '# BEGIN Python_Firewall limits'
+        self.limit_block_end = '# END Python_Firewall limits'
+
+        # Custom limit rules, keyed by (port, protocol, kind), loaded from UFW
+        self.active_limits = self.load_limit_rules()
+
     def clear_screen(self):
         """Clear the terminal screen."""
         os.system('clear' if os.name != 'nt' else 'cls')
@@ -67,13 +90,231 @@ class NetworkConfigManager:
             return False
 
     def add_rule(self, port: int, protocol: str = 'tcp', action: str = 'allow') -> bool:
-        """Add a new firewall rule."""
+        """Add a new firewall rule (allow, deny, reject or limit)."""
+        if action not in ('allow', 'deny', 'reject', 'limit'):
+            print(f"\nError: Unsupported action '{action}'")
+            return False
         try:
             subprocess.run(['ufw', action, f'{port}/{protocol}'], check=True)
             return True
         except subprocess.CalledProcessError:
             return False
 
+    def get_service_limits(self, service: Optional[str] = None) -> Dict[str, int]:
+        """Return the rate/burst/connlimit values for a service."""
+        limits = dict(self.default_limits)
+        if service in self.service_limits:
+            limits.update(self.service_limits[service])
+        return limits
+
+    def _limit_rule_args(self, port: int, protocol: str, kind: str,
+                         limits: Dict[str, int], family: str = 'ipv4') -> List[str]:
+        """Build the rules file line for a limit rule."""
+        chain = 'ufw-before-input' if family == 'ipv4' else 'ufw6-before-input'
+        # Loopback traffic is left alone so local clients are never limited
+        args = ['-A', chain, '!', '-i', 'lo', '-p', protocol, '--dport', str(port),
+                '-m', 'conntrack', '--ctstate', 'NEW']
+        if kind == 'rate':
+            args += ['-m', 'hashlimit',
+                     '--hashlimit-above', f"{limits['rate']}/second",
+                     '--hashlimit-burst', str(limits['burst']),
+                     '--hashlimit-mode', 'srcip',
+                     '--hashlimit-name', self._limit_table_name(port, protocol)]
+        else:
+            args += ['-m', 'connlimit',
+                     '--connlimit-above', str(limits['connlimit']),
+                     '--connlimit-mask', '32' if family == 'ipv4' else '128']
+        return args + ['-j', 'DROP']
+
+    def _limit_table_name(self, port: int, protocol: str) -> str:
+        """Name of the kernel hashlimit table for a port."""
+        return f"lim_{port}_{protocol}"
+
+    def _parse_limit_rule(self, line: str) -> Optional[Tuple[Tuple[int, str, str], Dict[str, int]]]:
+        """Parse a rules file line written by _limit_rule_args."""
+        args = line.split()
+        try:
+            port = int(args[args.index('--dport') + 1])
+            protocol = args[args.index('-p') + 1]
+            if '--hashlimit-above' in args:
+                rate = args[args.index('--hashlimit-above') + 1].split('/')[0]
+                burst = args[args.index('--hashlimit-burst') + 1]
+                return (port, protocol, 'rate'), {'rate': int(rate), 'burst': int(burst)}
+            connlimit = args[args.index('--connlimit-above') + 1]
+            return (port, protocol, 'connlimit'), {'connlimit': int(connlimit)}
+        except (ValueError, IndexError):
+            return None
+
+    def load_limit_rules(self) -> Dict[Tuple[int, str, str], Dict[str, int]]:
+        """Load the custom limit rules from the UFW before.rules block."""
+        limits = {}
+        try:
+            with open(self.limit_rules_files['ipv4']) as rules_file:
+                lines = rules_file.read().splitlines()
+        except OSError:
+            return limits
+
+        in_block = False
+        for line in lines:
+            if line == self.limit_block_start:
+                in_block = True
+            elif line == self.limit_block_end:
+                in_block = False
+            elif in_block and line.startswith('-A '):
+                parsed = self._parse_limit_rule(line)
+                if parsed:
+                    limits[parsed[0]] = parsed[1]
+        return limits
+
+    def _render_limit_rules(self, content: str, limits: Dict[Tuple[int, str, str], Dict[str, int]],
+                            family: str) -> Optional[str]:
+        """Return rules file content with the limit block replaced."""
+        lines = content.splitlines()
+
+        # Drop any existing block so rules are never duplicated
+        if self.limit_block_start in lines and self.limit_block_end in lines:
+            start = lines.index(self.limit_block_start)
+            end = lines.index(self.limit_block_end)
+            del lines[start:end + 1]
+
+        # Insert ahead of UFW's own rules, after the required chain declarations
+        if '# End required lines' in lines:
+            insert_at = lines.index('# End required lines') + 1
+        else:
+            insert_at = next((i for i, line in enumerate(lines) if line.startswith('-A ')), None)
+            if insert_at is None:
+                return None
+
+        block = [self.limit_block_start]
+        for (port, protocol, kind), values in sorted(limits.items()):
+            block.append(' '.join(self._limit_rule_args(port, protocol, kind, values, family)))
+        block.append(self.limit_block_end)
+
+        lines[insert_at:insert_at] = block
+        return '\n'.join(lines) + '\n'
+
+    def save_limit_rules(self, limits: Dict[Tuple[int, str, str], Dict[str, int]]) -> bool:
+        """Write the limit rules into UFW's before rules files and reload UFW.
+
+        The previous files are restored if writing or reloading fails.
+        """
+        originals = {}
+        try:
+            for path in self.limit_rules_files.values():
+                with open(path) as rules_file:
+                    originals[path] = rules_file.read()
+
+            for family, path in self.limit_rules_files.items():
+                content = self._render_limit_rules(originals[path], limits, family)
+                if content is None:
+                    raise OSError(f"Could not find where to insert rules in {path}")
+                with open(path, 'w') as rules_file:
+                    rules_file.write(content)
+
+            subprocess.run(['ufw', 'reload'], check=True)
+            self.active_limits = limits
+            return True
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"\nError saving limit rules: {str(e)}")
+            for path, content in originals.items():
+                try:
+                    with open(path, 'w') as rules_file:
+                        rules_file.write(content)
+                except OSError as restore_error:
+                    print(f"Error restoring {path}: {str(restore_error)}")
+            if originals:
+                subprocess.run(['ufw', 'reload'])
+            return False
+
+    def add_limit_rule(self, port: int, protocol: str = 'tcp', kind: str = 'rate',
+                       limits: Optional[Dict[str, int]] = None) -> bool:
+        """Add a per-source new connection rate limit or connection limit rule.
+
+        Rules are written for IPv4 and IPv6 into UFW's before rules
+        files, so they survive reloads and restarts of the firewall.
+        """
+        if kind not in ('rate', 'connlimit'):
+            print(f"\nError: Unsupported limit type '{kind}'")
+            return False
+        if kind == 'connlimit' and protocol != 'tcp':
+            print("\nError: Connection limits are only supported for tcp")
+            return False
+
+        # Warning for SSH port
+        if port == 22 and protocol == 'tcp':
+            print("\n⚠️  WARNING: You are about to limit connections to the SSH port!")
+            print("Limits that are too strict could lock you out of remote access to this server.")
+            confirm = input("Are you sure you want to continue? (yes/no): ").lower()
+            if confirm != 'yes':
+                print("Operation cancelled.")
+                return False
+        if limits is None:
+            limits = self.default_limits
+
+        if kind == 'rate':
+            values = {'rate': limits['rate'], 'burst': limits['burst']}
+        else:
+            values = {'connlimit': limits['connlimit']}
+
+        # Any existing rule of the same kind on this port is replaced
+        updated = dict(self.active_limits)
+        updated[(port, protocol, kind)] = values
+        return self.save_limit_rules(updated)
+
+    def delete_limit_rule(self, port: int, protocol: str = 'tcp', kind: str = 'rate') -> bool:
+        """Delete a connection rate limit or connection limit rule."""
+        key = (port, protocol, kind)
+        if key not in self.active_limits:
+            return False
+        updated = dict(self.active_limits)
+        del updated[key]
+        return self.save_limit_rules(updated)
+
+    def get_limit_occupancy(self) -> Dict[str, str]:
+        """Get current occupancy of the limit tables."""
+        occupancy = {}
+        for (port, protocol, kind), limits in self.active_limits.items():
+            label = f"{port}/{protocol} ({kind})"
+            try:
+                if kind == 'rate':
+                    # Each line in a hashlimit table is one tracked source
+                    name = self._limit_table_name(port, protocol)
+                    entries = 0
+                    loaded = False
+                    for table_dir in ('/proc/net/ipt_hashlimit', '/proc/net/ip6t_hashlimit'):
+                        table_path = os.path.join(table_dir, name)
+                        if os.path.exists(table_path):
+                            loaded = True
+                            with open(table_path) as table:
+                                entries += len(table.readlines())
+                    if not loaded:
+                        occupancy[label] = "Table not loaded (is the firewall enabled?)"
+                        continue
+                    occupancy[label] = (f"{entries} tracked sources "
+                                        f"(limit {limits['rate']} new connections/s, "
+                                        f"burst {limits['burst']})")
+                else:
+                    output = subprocess.check_output(
+                        ['ss', '-Htn', 'state', 'established', f'( sport = :{port} )']).decode()
+                    # Group connections by peer address to find the busiest source
+                    per_source = {}
+                    for line in output.splitlines():
+                        fields = line.split()
+                        if len(fields) < 4:
+                            continue
+                        peer = fields[3].rsplit(':', 1)[0].strip('[]')
+                        per_source[peer] = per_source.get(peer, 0) + 1
+                    if per_source:
+                        busiest = max(per_source, key=per_source.get)
+                        occupancy[label] = (f"busiest source {busiest} has {per_source[busiest]} "
+                                            f"connections (limit {limits['connlimit']} per source)")
+                    else:
+                        occupancy[label] = (f"no established connections "
+                                            f"(limit {limits['connlimit']} per source)")
+            except (OSError, subprocess.CalledProcessError) as e:
+                occupancy[label] = f"Error: {str(e)}"
+        return occupancy
+
     def delete_rule(self, port: int, protocol: str = 'tcp', action: str = 'allow') -> bool:
         """Delete an existing firewall rule."""
         try:
@@ -128,6 +369,109 @@ class NetworkConfigManager:
         print(f"{len(self.common_services) + 2}. Back to previous menu")
         return input(f"\nEnter your choice (1-{len(self.common_services) + 2}): ")
 
+    def select_service(self) -> Optional[Tuple[str, int, str]]:
+        """Prompt for a service or custom port, returning (service, port, protocol)."""
+        service_choice = self.display_services_menu()
+        service_idx = int(service_choice) - 1
+        if service_idx == len(self.common_services):
+            # Custom port
+            port = int(input("Enter the port number: "))
+            protocol = input("Enter protocol (tcp/udp) [tcp]: ").lower() or 'tcp'
+            return 'Custom', port, protocol
+        elif 0 <= service_idx < len(self.common_services):
+            service = list(self.common_services.keys())[service_idx]
+            return service, self.common_services[service], 'tcp'
+        return None
+
+    def prompt_limits(self, service: str, kind: str) -> Dict[str, int]:
+        """Prompt for limit values, defaulting to the service's configured limits.
+
+        Tuning entered here is kept in service_limits for the current
+        session only once the rule has been applied.
+        """
+        limits = self.get_service_limits(service)
+        if kind == 'rate':
+            limits['rate'] = int(input(f"New connections per second per source [{limits['rate']}]: ")
+                                 or limits['rate'])
+            limits['burst'] = int(input(f"Burst [{limits['burst']}]: ") or limits['burst'])
+        else:
+            limits['connlimit'] = int(input(f"Max connections per source [{limits['connlimit']}]: ")
+                                      or limits['connlimit'])
+        if any(value <= 0 for value in limits.values()):
+            raise ValueError("Limits must be positive")
+        return limits
+
+    def handle_limit_management(self):
+        """Handle rate limit and connection limit menu."""
+        while True:
+            self.clear_screen()
+            print("=== Rate Limiting ===")
+            print("\n1. UFW limit for service (6 connections / 30s)")
+            print("2. Custom rate limit for service")
+            print("3. Connection limit for service")
+            print("4. Remove limit")
+            print("5. Show limit table occupancy")
+            print("6. Back to previous menu")
+
+            choice = input("\nEnter your choice (1-6): ")
+
+            if choice in ('1', '2', '3'):
+                try:
+                    selection = self.select_service()
+                    if selection is None:
+                        continue
+                    service, port, protocol = selection
+
+                    if choice == '1':
+                        success = self.add_rule(port, protocol, 'limit')
+                    else:
+                        kind = 'rate' if choice == '2' else 'connlimit'
+                        limits = self.prompt_limits(service, kind)
+                        success = self.add_limit_rule(port, protocol, kind, limits)
+                        if success and service in self.common_services:
+                            self.service_limits[service] = limits
+
+                    if success:
+                        print(f"\nSuccessfully limited port {port}/{protocol}")
+                    else:
+                        print(f"\nFailed to limit port {port}/{protocol}")
+                except ValueError:
+                    print("\nInvalid input. Please enter a positive number.")
+                input("\nPress Enter to continue...")
+
+            elif choice == '4':
+                try:
+                    port = int(input("Enter the port number: "))
+                    protocol = input("Enter protocol (tcp/udp) [tcp]: ").lower() or 'tcp'
+                    kind = input("Enter limit type (ufw/rate/connlimit) [rate]: ").lower() or 'rate'
+
+                    if kind == 'ufw':
+                        success = self.delete_rule(port, protocol, 'limit')
+                    else:
+                        success = self.delete_limit_rule(port, protocol, kind)
+
+                    if success:
+                        print(f"\nSuccessfully removed {kind} limit on {port}/{protocol}")
+                    else:
+                        print(f"\nFailed to remove {kind} limit on {port}/{protocol}")
+                except ValueError:
+                    print("\nInvalid input. Please enter a number.")
+                input("\nPress Enter to continue...")
+
+            elif choice == '5':
+                self.clear_screen()
+                print("=== Limit Table Occupancy ===\n")
+                occupancy = self.get_limit_occupancy()
+                if occupancy:
+                    for label, details in occupancy.items():
+                        print(f"{label}: {details}")
+                else:
+                    print("No custom limit rules are active.")
+                input("\nPress Enter to continue...")
+
+            elif choice == '6':
+                break
+
     def handle_port_management(self):
         """Handle port management menu."""
         while True:
@@ -135,24 +479,17 @@ class NetworkConfigManager:
             print("=== Port Management ===")
             print("\n1. Open port for service")
             print("2. Close port")
-            print("3. Back to previous menu")
+            print("3. Rate limit ports")
+            print("4. Back to previous menu")
             
-            choice = input("\nEnter your choice (1-3): ")
+            choice = input("\nEnter your choice (1-4): ")
             
             if choice == '1':
-                service_choice = self.display_services_menu()
                 try:
-                    service_idx = int(service_choice) - 1
-                    if service_idx == len(self.common_services):
-                        # Custom port
-                        port = int(input("Enter the port number: "))
-                        protocol = input("Enter protocol (tcp/udp) [tcp]: ").lower() or 'tcp'
-                    elif service_idx < len(self.common_services):
-                        service = list(self.common_services.keys())[service_idx]
-                        port = self.common_services[service]
-                        protocol = 'tcp'
-                    else:
+                    selection = self.select_service()
+                    if selection is None:
                         continue
+                    _, port, protocol = selection
 
                     if self.add_rule(port, protocol):
                         print(f"\nSuccessfully opened port {port}/{protocol}")
@@ -177,6 +514,9 @@ class NetworkConfigManager:
                 input("\nPress Enter to continue...")
                 
             elif choice == '3':
+                self.handle_limit_management()
+
+            elif choice == '4':
                 break
 
     def run(self):